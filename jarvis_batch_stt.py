@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Jarvis Batch STT - transcribe archives of recorded utterances
+Takes a directory of WAV files or a manifest, transcribes them concurrently
+under an in-flight limit and a token-bucket rate limit, and streams results
+to a JSONL file. Re-running with the same output resumes where it stopped.
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import jarvis_voice_full
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts up to `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def read_inputs(source):
+    """WAV paths from a directory (recursively) or a manifest
+
+    A manifest is either one path per line or JSONL with a "path" field;
+    relative paths are taken relative to the manifest.
+    """
+    if os.path.isdir(source):
+        return sorted(glob.glob(os.path.join(source, "**", "*.wav"), recursive=True))
+
+    base = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path = json.loads(line)["path"] if line.startswith("{") else line
+            paths.append(os.path.join(base, path))
+    return paths
+
+
+def read_done(output, model):
+    """Paths already transcribed successfully with model by a previous run"""
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Partially written line from an interrupted run
+            if "error" not in record and record.get("model") == model:
+                done.add(record["path"])
+    return done
+
+
+async def transcribe_all(paths, output, concurrency, bucket, model):
+    slots = asyncio.Semaphore(concurrency)
+    counts = {"ok": 0, "error": 0}
+
+    with open(output, 'a') as out:
+        async def transcribe(path):
+            async with slots:
+                await bucket.acquire()
+                started = time.perf_counter()
+                record = {"path": path, "model": model}
+                try:
+                    # An explicit model is never hedged: one rate-limited request per file, by that model
+                    record["text"] = await asyncio.to_thread(jarvis_voice_full.transcribe_file, path, model)
+                    counts["ok"] += 1
+                except Exception as e:
+                    record["error"] = f"{type(e).__name__}: {e}"
+                    counts["error"] += 1
+                record["ms"] = round((time.perf_counter() - started) * 1000, 1)
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                done = counts["ok"] + counts["error"]
+                if done % 10 == 0 or done == len(paths):
+                    print(f"  {done}/{len(paths)} done ({counts['error']} errors)")
+
+        await asyncio.gather(*(transcribe(path) for path in paths))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch-transcribe WAV files with Gemini STT")
+    parser.add_argument("source", help="directory of WAV files, or a manifest (paths or JSONL with \"path\")")
+    parser.add_argument("-o", "--output", required=True, help="JSONL results file (appended to; used to resume)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="max requests in flight")
+    parser.add_argument("--rate", type=float, default=2.0, help="max requests per second")
+    parser.add_argument("--burst", type=int, default=4, help="token bucket size")
+    parser.add_argument("--model", help=f"STT model (default {jarvis_voice_full.GEMINI_STT_MODEL})")
+    args = parser.parse_args()
+
+    model = args.model or jarvis_voice_full.GEMINI_STT_MODEL
+    paths = read_inputs(args.source)
+    done = read_done(args.output, model)
+    todo = [path for path in paths if path not in done]
+    print(f"{len(paths)} files, {len(paths) - len(todo)} already done with {model}, {len(todo)} to transcribe")
+    if not todo:
+        return 0
+
+    loop = asyncio.new_event_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=args.concurrency))
+    started = time.perf_counter()
+    counts = loop.run_until_complete(transcribe_all(
+        todo, args.output, args.concurrency, TokenBucket(args.rate, args.burst), model))
+    loop.close()
+    elapsed = time.perf_counter() - started
+    print(f"Transcribed {counts['ok']} files in {elapsed:.1f}s ({counts['error']} errors)")
+    return 1 if counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Jarvis Bench - end-to-end latency benchmark for the voice pipeline
+Runs a local stand-in for the Gemini generateContent endpoint and a local
+clawdbot gateway, then replays WAV fixtures through process_recording.
+"""
+
+import argparse
+import asyncio
+import tracemalloc
+import base64
+import glob
+import json
+import os
+import ssl
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from websockets.asyncio.server import serve
+
+from jarvis_metrics import percentile
+
+CHUNK = 1024
+
+
+class MockGemini:
+    """generateContent stand-in: transcribes anything with inline audio, synthesizes the rest"""
+
+    def __init__(self, stt_delay, tts_delay, tts_bytes, transcript, certfile=None, keyfile=None):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like the real endpoint
+
+            def read_body(self, keep=64 * 1024):
+                """Read a Content-Length or chunked body, keeping only the first `keep` bytes"""
+                kept = b""
+                if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                    while size := int(self.rfile.readline().split(b";")[0], 16):
+                        while size:
+                            data = self.rfile.read(min(size, 64 * 1024))
+                            size -= len(data)
+                            kept += data[:keep - len(kept)]
+                        self.rfile.readline()
+                    self.rfile.readline()
+                else:
+                    remaining = int(self.headers["Content-Length"])
+                    while remaining:
+                        data = self.rfile.read(min(remaining, 64 * 1024))
+                        remaining -= len(data)
+                        kept += data[:keep - len(kept)]
+                return kept
+
+            def do_POST(self):
+                # TTS requests are small, so their generationConfig is always in the kept prefix
+                if b'"response_modalities"' in self.read_body():
+                    time.sleep(mock.tts_delay)
+                    part = {"inlineData": {"mimeType": "audio/L16;rate=24000", "data": mock.tts_audio}}
+                else:
+                    time.sleep(mock.stt_delay)
+                    part = {"text": mock.transcript}
+                out = json.dumps({"candidates": [{"content": {"parts": [part]}}]}).encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.stt_delay = stt_delay
+        self.tts_delay = tts_delay
+        self.tts_audio = base64.b64encode(bytes(tts_bytes)).decode('ascii')
+        self.transcript = transcript
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.scheme = "http"
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+            self.scheme = "https"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"{self.scheme}://127.0.0.1:{self.server.server_address[1]}"
+
+
+class MockGateway:
+    """Local WebSocket server speaking the clawdbot connect/agent protocol"""
+
+    def __init__(self, handshake_delay, agent_delay, reply):
+        self.handshake_delay = handshake_delay
+        self.agent_delay = agent_delay
+        self.reply = reply
+        self.port = None
+        ready = threading.Event()
+
+        async def run():
+            async with serve(self._handle, "127.0.0.1", 0) as server:
+                self.port = server.sockets[0].getsockname()[1]
+                ready.set()
+                await asyncio.Future()
+
+        threading.Thread(target=lambda: asyncio.run(run()), daemon=True).start()
+        ready.wait()
+
+    async def _handle(self, ws):
+        async for raw in ws:
+            frame = json.loads(raw)
+            if frame.get("method") == "connect":
+                await asyncio.sleep(self.handshake_delay)
+                await ws.send(json.dumps({"type": "res", "id": frame["id"], "ok": True, "payload": {"type": "hello-ok"}}))
+                continue
+
+            run_id = frame["params"]["idempotencyKey"]
+            await ws.send(json.dumps({"type": "res", "id": frame["id"], "ok": True,
+                                      "payload": {"status": "accepted", "runId": run_id}}))
+            # Stream the reply word by word over the agent delay
+            words = self.reply.split(" ")
+            for i, word in enumerate(words):
+                await asyncio.sleep(self.agent_delay / len(words))
+                delta = word if i == 0 else " " + word
+                await ws.send(json.dumps({"type": "event", "event": "agent", "payload": {
+                    "runId": run_id, "stream": "assistant", "data": {"delta": delta}}}))
+            await ws.send(json.dumps({"type": "res", "id": frame["id"], "ok": True, "payload": {
+                "status": "ok", "runId": run_id, "result": {"payloads": [{"text": self.reply}]}}}))
+
+
+def load_frames(path):
+    """Read a WAV fixture into recorder-style CHUNK-sized frames"""
+    with wave.open(path, 'rb') as wf:
+        frames = []
+        while data := wf.readframes(CHUNK):
+            frames.append(data)
+    return frames
+
+
+def silent_fixture(seconds, sample_rate=44100):
+    """Frames of silence, for when no fixtures are given"""
+    return [bytes(CHUNK * 2)] * int(seconds * sample_rate / CHUNK)
+
+
+def legacy_stt_body(audio_file):
+    """The STT request body as it was built before streaming uploads"""
+    with open(audio_file, 'rb') as f:
+        audio_b64 = base64.b64encode(f.read()).decode('utf-8')
+    payload = {"contents": [{"parts": [{"inline_data": {"mime_type": "audio/wav", "data": audio_b64}}]}]}
+    return json.dumps(payload).encode('utf-8')
+
+
+def memory_benchmark(jarvis_voice_full, seconds):
+    """Peak Python memory above the raw PCM while encoding and uploading one recording"""
+    frames = [bytes(CHUNK * 2) for _ in range(int(seconds * jarvis_voice_full.SAMPLE_RATE / CHUNK))]
+    pcm_bytes = sum(len(frame) for frame in frames)
+    audio_file = tempfile.mktemp(suffix=".wav")
+    jarvis_voice_full.recorder.save_wav(frames, audio_file)
+
+    def peak_above_baseline(fn, *args):
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        fn(*args)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+        return peak
+
+    streamed = peak_above_baseline(jarvis_voice_full.transcribe_frames, frames)
+    legacy = peak_above_baseline(legacy_stt_body, audio_file)
+    os.remove(audio_file)
+
+    mb = 1024 * 1024
+    print("\n" + "=" * 50)
+    print(f"  Raw PCM:                    {pcm_bytes / mb:.1f} MB ({seconds:.0f}s)")
+    print(f"  Streamed STT upload peak:   +{streamed / mb:.2f} MB")
+    print(f"  Buffered body (old) peak:   +{legacy / mb:.2f} MB (building the body only)")
+    print("=" * 50)
+    return {"pcm_bytes": pcm_bytes, "streamed_peak_bytes": streamed, "legacy_peak_bytes": legacy}
+
+
+def summarize(latencies):
+    return {f"p{int(q * 100)}": round(percentile(latencies, q) * 1000, 1) for q in (0.5, 0.95, 0.99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Jarvis voice pipeline against local mocks")
+    parser.add_argument("fixtures", nargs="*", help="WAV files or directories of WAV files")
+    parser.add_argument("-n", "--requests", type=int, default=20, help="utterances to replay")
+    parser.add_argument("-c", "--concurrency", type=int, default=1, help="utterances in flight at once")
+    parser.add_argument("--silence", type=float, default=3.0, help="seconds of silence to replay if no fixtures")
+    parser.add_argument("--stt-delay", type=float, default=0.4)
+    parser.add_argument("--tts-delay", type=float, default=0.3)
+    parser.add_argument("--tts-bytes", type=int, default=96000, help="PCM bytes per TTS response")
+    parser.add_argument("--handshake-delay", type=float, default=0.02)
+    parser.add_argument("--agent-delay", type=float, default=1.5)
+    parser.add_argument("--reply", default="Sure, I've taken care of that. The lights are now off. Anything else?")
+    parser.add_argument("--transcript", default="Turn off the lights please")
+    parser.add_argument("--tls-cert", help="serve the Gemini stand-in over HTTPS with this certificate")
+    parser.add_argument("--tls-key")
+    parser.add_argument("--tts-cache-mb", type=int, default=0, help="TTS cache size (default 0: every chunk is synthesized)")
+    parser.add_argument("--memory", type=float, metavar="SECONDS",
+                        help="instead of replaying, measure STT upload memory for a recording this long")
+    parser.add_argument("--audio-output", default="null:100",
+                        help="JARVIS_AUDIO_OUTPUT for the replay (default: discard audio at 100x real time; "
+                             "\"null\" paces playback like a real device)")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    gemini = MockGemini(args.stt_delay, args.tts_delay, args.tts_bytes, args.transcript,
+                        certfile=args.tls_cert, keyfile=args.tls_key)
+    gateway = MockGateway(args.handshake_delay, args.agent_delay, args.reply)
+
+    # jarvis_voice_full reads its configuration at import time
+    os.environ["JARVIS_GEMINI_BASE_URL"] = gemini.url
+    if args.tls_cert:
+        os.environ["JARVIS_GEMINI_CA_FILE"] = args.tls_cert
+    os.environ["JARVIS_SSH_TUNNEL_PORT"] = str(gateway.port)
+    os.environ["JARVIS_AUDIO_OUTPUT"] = args.audio_output
+    os.environ["JARVIS_METRICS_FILE"] = ""
+    os.environ["JARVIS_TTS_CACHE_DIR"] = tempfile.mkdtemp(prefix="jarvis_bench_tts_")
+    os.environ["JARVIS_TTS_CACHE_MAX_MB"] = str(args.tts_cache_mb)
+    import jarvis_voice_full
+
+    if args.memory:
+        report = memory_benchmark(jarvis_voice_full, args.memory)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(report, f, indent=2)
+        return
+
+    paths = []
+    for fixture in args.fixtures:
+        paths.extend(sorted(glob.glob(os.path.join(fixture, "*.wav"))) if os.path.isdir(fixture) else [fixture])
+    fixtures = [load_frames(path) for path in paths] or [silent_fixture(args.silence)]
+
+    def replay(i):
+        started = time.perf_counter()
+        jarvis_voice_full.process_recording(fixtures[i % len(fixtures)])
+        return time.perf_counter() - started
+
+    print(f"Replaying {args.requests} utterances ({len(fixtures)} fixtures), concurrency {args.concurrency}...")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies = list(pool.map(replay, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    report = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "throughput_per_s": round(args.requests / elapsed, 3),
+        "end_to_end_ms": summarize(latencies),
+        "stages": jarvis_voice_full.metrics.summary(),
+        "gemini_http": jarvis_voice_full.http_client.stats(),
+        "tts_cache": jarvis_voice_full.tts_cache.stats(),
+        "playback": jarvis_voice_full.player.stats(),
+    }
+
+    print("\n" + "=" * 50)
+    print(f"  Throughput: {report['throughput_per_s']} utterances/s")
+    e2e = report["end_to_end_ms"]
+    print(f"  End to end: p50={e2e['p50']}ms p95={e2e['p95']}ms p99={e2e['p99']}ms")
+    for stage, summary in report["stages"].items():
+        print(f"  {stage:<22} n={summary['count']:<4} p50={summary['p50']}ms p95={summary['p95']}ms p99={summary['p99']}ms")
+    print("=" * 50)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,8 @@ import sys
 import os
 import glob
 
+from jarvis_ready import notify_ready
+
 try:
     import objc
     from AppKit import (
@@ -86,6 +88,7 @@ class JarvisEyeApp(NSObject):
         self.frames = []
         self.current_frame = 0
         self.frame_counter = 0.0
+        self.shown = False
 
         # Mouse tracking for direction
         self.last_mouse_x = 0.0
@@ -180,6 +183,11 @@ class JarvisEyeApp(NSObject):
             self.current_frame = (self.current_frame + 1) % len(self.frames)
             self.image_view.setImage_(self.frames[self.current_frame])
 
+        # The first tick runs once the run loop has put the window on screen
+        if not self.shown:
+            self.shown = True
+            notify_ready("eye")
+
 
 def main():
     print("Starting Jarvis Eye (Video Animation)...")
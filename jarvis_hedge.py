@@ -0,0 +1,131 @@
+"""
+Jarvis Hedge - hedged requests to cut tail latency
+If the primary request has not answered within a threshold taken from recent
+latencies, a backup request is sent; the first good answer wins and the other
+request is cancelled. To measure what hedging saves, every probe_every-th
+hedge win lets the slow primary finish in the background and records how
+much later it answered.
+
+Each attempt runs on its own thread rather than in a shared pool, so the
+hedge timer and the recorded latencies never include time spent queued
+behind other callers' requests.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from jarvis_http import Cancellation
+from jarvis_metrics import percentile
+
+
+class Hedger:
+    def __init__(self, quantile=0.95, min_delay=0.5, max_delay=10.0, initial_delay=2.0,
+                 min_samples=10, window=200, probe_every=10):
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.initial_delay = initial_delay  # Used until min_samples latencies are known
+        self.min_samples = min_samples
+        self.probe_every = probe_every
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._latencies = deque(maxlen=window)
+        self._savings = deque(maxlen=window)  # Measured by probes: primary latency - hedged latency
+        self._lock = threading.Lock()
+
+    def threshold(self):
+        """How long to wait for the primary before hedging"""
+        with self._lock:
+            latencies = list(self._latencies)
+        if len(latencies) < self.min_samples:
+            return self.initial_delay
+        return min(max(percentile(latencies, self.quantile), self.min_delay), self.max_delay)
+
+    @staticmethod
+    def _start(request, cancel):
+        """Run request(cancel) on a new thread, returning a Future for its result"""
+        future = Future()
+
+        def run():
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(request(cancel))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, daemon=True, name="hedge").start()
+        return future
+
+    def _probe(self, primary, started, elapsed):
+        """Record how much later the primary answered than the winning backup"""
+        def done(future):
+            if future.exception() is None:
+                with self._lock:
+                    self._savings.append(time.perf_counter() - started - elapsed)
+
+        primary.add_done_callback(done)
+
+    def call(self, primary, backup, cancel=None):
+        """Run primary(cancel), hedging with backup(cancel) if it is slow
+
+        Both callables take a Cancellation to pass to HTTPClient.request. The
+        first one to return wins; if both raise, the last error is re-raised.
+        Cancelling cancel (a Cancellation) aborts both.
+        """
+        with self._lock:
+            self.calls += 1
+        started = time.perf_counter()
+        cancels = [Cancellation(), Cancellation()]
+        if cancel is not None:
+            for inner in cancels:
+                cancel.link(inner)
+        primary_future = self._start(primary, cancels[0])
+        futures = {primary_future: 0}
+        request_started = [started, None]
+
+        done, pending = wait(futures, timeout=self.threshold())
+        if not done:
+            with self._lock:
+                self.hedged += 1
+            request_started[1] = time.perf_counter()
+            futures[self._start(backup, cancels[1])] = 1
+            pending = set(futures)
+
+        error = None
+        while True:
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                winner = futures[future]
+                now = time.perf_counter()
+                with self._lock:
+                    self._latencies.append(now - request_started[winner])
+                    if winner == 1:
+                        self.hedge_wins += 1
+                    probe = winner == 1 and (self.hedge_wins - 1) % self.probe_every == 0
+                if probe:
+                    self._probe(primary_future, started, now - started)
+                else:
+                    cancels[1 - winner].cancel()
+                return future.result()
+            if not pending:
+                raise error
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+    def stats(self):
+        """Counters plus saved time, extrapolated from the probed hedge wins"""
+        with self._lock:
+            mean_saved = sum(self._savings) / len(self._savings) if self._savings else 0.0
+            return {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "hedge_rate": self.hedged / self.calls if self.calls else 0.0,
+                "hedge_wins": self.hedge_wins,
+                "probes": len(self._savings),
+                "saved_per_win_seconds": round(mean_saved, 3),
+                "saved_seconds": round(mean_saved * self.hedge_wins, 3),
+            }
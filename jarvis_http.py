@@ -0,0 +1,206 @@
+"""
+Jarvis HTTP - pooled keep-alive HTTP(S) client shared by the Gemini calls
+Reuses TCP/TLS connections across requests, asks for compressed responses
+and applies separate connect and read timeouts.
+"""
+
+import gzip
+import http.client
+import socket
+import ssl
+import threading
+import zlib
+from urllib.parse import urlsplit
+
+
+class HTTPStatusError(OSError):
+    """Non-2xx response (an OSError, like urllib's HTTPError)"""
+
+    def __init__(self, status, reason, body):
+        super().__init__(f"HTTP {status} {reason}")
+        self.status = status
+        self.reason = reason
+        self.body = body
+
+
+class RequestCancelled(OSError):
+    """The request was aborted through its Cancellation"""
+
+
+class Cancellation:
+    """Lets another thread abort an in-flight request by shutting its socket down"""
+
+    def __init__(self):
+        self.cancelled = False
+        self._conn = None
+        self._linked = []
+        self._lock = threading.Lock()
+
+    def attach(self, conn):
+        with self._lock:
+            self._conn = conn
+            if self.cancelled:
+                self._shutdown()
+
+    def detach(self):
+        """Forget the connection (it may go back to the pool); returns whether we were cancelled"""
+        with self._lock:
+            self._conn = None
+            return self.cancelled
+
+    def link(self, other):
+        """Cancel other too when this is cancelled"""
+        with self._lock:
+            if not self.cancelled:
+                self._linked.append(other)
+                return
+        other.cancel()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            self._shutdown()
+            linked, self._linked = self._linked, []
+        for other in linked:
+            other.cancel()
+
+    def _shutdown(self):
+        if self._conn is not None and self._conn.sock is not None:
+            try:
+                self._conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+# Raised when a pooled connection was closed by the server while idle
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+
+class HTTPClient:
+    def __init__(self, max_idle=4, connect_timeout=5, ssl_context=None):
+        self.max_idle = max_idle
+        self.connect_timeout = connect_timeout
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self.requests = 0
+        self.connections_opened = 0
+        self.stale_retries = 0
+        self._idle = {}  # (scheme, host, port) -> idle connections, most recent last
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _origin(url):
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        return (parts.scheme, parts.hostname, port), path
+
+    def _connect(self, origin, connect_timeout):
+        scheme, host, port = origin
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(host, port, timeout=connect_timeout, context=self.ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=connect_timeout)
+        conn.connect()  # DNS + TCP + TLS, bounded by the connect timeout
+        with self._lock:
+            self.connections_opened += 1
+        return conn
+
+    def _acquire(self, origin):
+        with self._lock:
+            idle = self._idle.get(origin)
+            if idle:
+                return idle.pop()
+        return None
+
+    def _release(self, origin, conn):
+        with self._lock:
+            idle = self._idle.setdefault(origin, [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def warm_up(self, url):
+        """Open a connection to url's origin ahead of time and park it in the pool"""
+        origin, _ = self._origin(url)
+        self._release(origin, self._connect(origin, self.connect_timeout))
+
+    def request(self, method, url, body=None, headers=None, connect_timeout=None, read_timeout=30, cancel=None):
+        """Send a request and return the (decompressed) response body
+
+        body is bytes, or a zero-argument callable returning an iterable of
+        bytes that is streamed with chunked transfer encoding (called again if
+        a stale pooled connection forces a retry).
+
+        connect_timeout bounds connection setup when no pooled connection is
+        available; read_timeout bounds each wait for the response. Raises
+        HTTPStatusError for non-2xx responses and RequestCancelled if cancel
+        (a Cancellation) fires first.
+        """
+        origin, path = self._origin(url)
+        headers = dict(headers or {})
+        headers.setdefault("Accept-Encoding", "gzip, deflate")
+        with self._lock:
+            self.requests += 1
+
+        conn = self._acquire(origin)
+        reused = conn is not None
+        while True:
+            if conn is None:
+                conn = self._connect(origin, connect_timeout or self.connect_timeout)
+            conn.sock.settimeout(read_timeout)
+            if cancel is not None:
+                cancel.attach(conn)
+            try:
+                conn.request(method, path, body=body() if callable(body) else body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except BaseException as e:
+                conn.close()
+                if cancel is not None and cancel.detach():
+                    raise RequestCancelled("request cancelled") from e
+                if not (reused and isinstance(e, STALE_CONNECTION_ERRORS)):
+                    raise
+                # The server dropped the idle connection; retry once on a fresh one
+                with self._lock:
+                    self.stale_retries += 1
+                conn, reused = None, False
+                continue
+            break
+
+        if cancel is not None and cancel.detach():
+            conn.close()
+            raise RequestCancelled("request cancelled")
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(origin, conn)
+
+        encoding = response.getheader("Content-Encoding", "").lower()
+        if encoding == "gzip":
+            data = gzip.decompress(data)
+        elif encoding == "deflate":
+            data = zlib.decompress(data)
+
+        if not 200 <= response.status < 300:
+            raise HTTPStatusError(response.status, response.reason, data)
+        return data
+
+    def stats(self):
+        """Request and connection counters; requests - connections_opened is the handshakes saved"""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "stale_retries": self.stale_retries,
+                "idle": sum(len(idle) for idle in self._idle.values()),
+            }
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
@@ -0,0 +1,189 @@
+"""
+Jarvis Metrics - per-stage latency spans for the voice pipeline
+Keeps rolling p50/p95/p99 per stage, appends every span to a JSONL file and
+can serve everything in Prometheus text format on localhost. The JSONL file
+is written by a background thread, so recording a span never does file I/O,
+and it is rotated to <path>.1 once it reaches max_bytes.
+"""
+
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Trace of the utterance being processed; asyncio tasks and asyncio.to_thread
+# copy it, so spans deep inside the pipeline land on the right utterance
+current_trace = contextvars.ContextVar("jarvis_trace", default=None)
+
+
+def percentile(values, q):
+    """Linearly interpolated percentile of values (q in 0..1)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+class Trace:
+    """One utterance, from key release to the end of playback"""
+
+    def __init__(self, started=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.started = time.perf_counter() if started is None else started
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+class Metrics:
+    def __init__(self, window=500, jsonl_path=None, max_bytes=10 * 1024 * 1024, max_queued=10000):
+        self.window = window
+        self.jsonl_path = jsonl_path
+        self.max_bytes = max_bytes
+        self.records_dropped = 0  # Spans not written because the writer fell max_queued behind
+        self._samples = {}  # stage -> deque of recent durations (seconds)
+        self._totals = {}  # stage -> [count, sum] over the whole run
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._records = queue.Queue(maxsize=max_queued)
+        self._writer = None
+        if jsonl_path:
+            os.makedirs(os.path.dirname(os.path.abspath(jsonl_path)), exist_ok=True)
+            self._writer = threading.Thread(target=self._write_records, daemon=True, name="metrics-writer")
+            self._writer.start()
+
+    def observe(self, stage, seconds, trace=None, error=None):
+        """Record one span"""
+        trace = trace or current_trace.get()
+        with self._lock:
+            if error is None:
+                self._samples.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+                totals = self._totals.setdefault(stage, [0, 0.0])
+                totals[0] += 1
+                totals[1] += seconds
+        if self._writer is not None:
+            record = {
+                "ts": time.time(),
+                "trace": trace.id if trace else None,
+                "stage": stage,
+                "ms": round(seconds * 1000, 3),
+            }
+            if error is not None:
+                record["error"] = error
+            try:
+                self._records.put_nowait(record)
+            except queue.Full:
+                with self._lock:
+                    self.records_dropped += 1
+
+    def _write_records(self):
+        """Writer thread: append queued records in batches, rotating the file when it is full"""
+        while True:
+            batch = [self._records.get()]
+            while True:
+                try:
+                    batch.append(self._records.get_nowait())
+                except queue.Empty:
+                    break
+            records = [record for record in batch if record is not None]
+            if records:
+                try:
+                    if os.path.exists(self.jsonl_path) and os.path.getsize(self.jsonl_path) >= self.max_bytes:
+                        os.replace(self.jsonl_path, self.jsonl_path + ".1")
+                    with open(self.jsonl_path, 'a') as f:
+                        f.write("".join(json.dumps(record) + "\n" for record in records))
+                except OSError as e:
+                    print(f"Metrics: could not write {self.jsonl_path}: {e}")
+            if None in batch:
+                return
+
+    def close(self, timeout=2.0):
+        """Write out the queued records and stop the writer"""
+        if self._writer is None:
+            return
+        self._records.put(None)
+        self._writer.join(timeout)
+        self._writer = None
+
+    @contextmanager
+    def span(self, stage, trace=None):
+        """Time the enclosed block as one span of stage"""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.observe(stage, time.perf_counter() - started, trace, error=type(e).__name__)
+            raise
+        self.observe(stage, time.perf_counter() - started, trace)
+
+    def add_collector(self, collect):
+        """Register a callable returning {name: value} gauges to include in the export"""
+        self._collectors.append(collect)
+
+    def summary(self):
+        """{stage: {"count", "p50", "p95", "p99"}} with latencies in milliseconds"""
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+        result = {}
+        for stage, values in samples.items():
+            result[stage] = {"count": len(values)}
+            for q in QUANTILES:
+                result[stage][f"p{int(q * 100)}"] = round(percentile(values, q) * 1000, 1)
+        return result
+
+    def gauges(self):
+        with self._lock:
+            values = {"metrics_records_dropped": self.records_dropped}
+        for collect in self._collectors:
+            values.update(collect())
+        return values
+
+    def prometheus_text(self):
+        """Render the rolling percentiles and gauges in Prometheus text format"""
+        lines = ["# TYPE jarvis_stage_seconds summary"]
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+            totals = {stage: list(t) for stage, t in self._totals.items()}
+        for stage in sorted(samples):
+            for q in QUANTILES:
+                lines.append(f'jarvis_stage_seconds{{stage="{stage}",quantile="{q}"}} {percentile(samples[stage], q):.6f}')
+            lines.append(f'jarvis_stage_seconds_sum{{stage="{stage}"}} {totals[stage][1]:.6f}')
+            lines.append(f'jarvis_stage_seconds_count{{stage="{stage}"}} {totals[stage][0]}')
+        for name, value in sorted(self.gauges().items()):
+            lines.append(f"# TYPE jarvis_{name} gauge")
+            lines.append(f"jarvis_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve /metrics in Prometheus text format from a background thread"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
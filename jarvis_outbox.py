@@ -0,0 +1,202 @@
+"""
+Jarvis Outbox - durable, append-only queue of outgoing messages
+Messages are on disk before put() returns; a background sender delivers them
+in order, retrying with backoff, and acknowledges them in the same log so
+nothing is lost or sent twice across restarts. The batch being sent and its
+idempotency key are logged too, so every retry (even after a restart) sends
+exactly the same batch under the same key.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+from jarvis_http import HTTPStatusError
+
+AUTH_ERRORS = (401, 403)  # Pause and keep the messages: the token needs fixing, not the messages
+TRANSIENT_ERRORS = (408, 429)
+
+
+class Rejected(Exception):
+    """Raised by deliver() when the receiver refused the batch; it is dropped, not retried"""
+
+
+class Outbox:
+    def __init__(self, path, deliver, batch_size=1, max_backoff=60.0):
+        """deliver(entries, idempotency_key) sends a batch of entries or raises"""
+        self.path = path
+        self.deliver = deliver
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self.delivered = 0
+        self.failed = 0
+        self.retries = 0
+        self.paused = None  # Why delivery is paused (an auth error), until resume()
+        self._pending = []  # Entries not yet acknowledged, oldest first
+        self._batch = None  # The in-flight batch record: {"op": "batch", "key": ..., "ids": [...]}
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._load()
+        self._compact()
+
+    def _load(self):
+        """Replay the log: every put without a matching ack is still pending"""
+        if not os.path.exists(self.path):
+            return
+        entries = {}
+        batch = None
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn write from a crash; the entry was never acknowledged to the user
+                if record["op"] == "put":
+                    entries[record["id"]] = record
+                elif record["op"] == "batch":
+                    batch = record
+                else:
+                    entries.pop(record["id"], None)
+        self._pending = list(entries.values())
+        if batch is not None and all(entry_id in entries for entry_id in batch["ids"]):
+            self._batch = batch
+
+    def _append(self, records):
+        with open(self.path, 'a') as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self):
+        """Rewrite the log with only the pending entries"""
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w') as f:
+            for entry in self._pending:
+                f.write(json.dumps(entry) + "\n")
+            if self._batch is not None:
+                f.write(json.dumps(self._batch) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def put(self, message, **fields):
+        """Durably queue a message; returns its id"""
+        entry = {"op": "put", "id": str(uuid.uuid4()), "ts": time.time(), "message": message, **fields}
+        with self._cond:
+            self._append([entry])
+            self._pending.append(entry)
+            self._cond.notify()
+        return entry["id"]
+
+    def pending(self):
+        with self._cond:
+            return len(self._pending)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop the sender, giving it up to timeout seconds to drain the queue"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending and not self.paused and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def resume(self):
+        """Resume delivery after a pause (e.g. once the token has been fixed)"""
+        with self._cond:
+            self.paused = None
+            self._cond.notify_all()
+
+    def _next_batch(self):
+        """The in-flight batch, forming and logging a new one if needed (with the lock held)"""
+        if self._batch is None:
+            entries = self._pending[:self.batch_size]
+            key = entries[0]["id"] if len(entries) == 1 else str(uuid.uuid4())
+            self._batch = {"op": "batch", "key": key, "ids": [entry["id"] for entry in entries]}
+            self._append([self._batch])
+        ids = set(self._batch["ids"])
+        return [entry for entry in self._pending if entry["id"] in ids], self._batch["key"]
+
+    def _run(self):
+        backoff = 1.0
+        while True:
+            with self._cond:
+                while (not self._pending or self.paused) and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                # Retried as is until acknowledged or dropped, so the key always means the same messages
+                batch, key = self._next_batch()
+
+            try:
+                self.deliver(batch, key)
+            except Rejected as e:
+                print(f"Outbox: dropping {len(batch)} message(s), rejected: {e}")
+                self._ack(batch, "drop")
+                self.failed += len(batch)
+                continue
+            except HTTPStatusError as e:
+                if e.status in AUTH_ERRORS:
+                    with self._cond:
+                        self.paused = str(e)
+                    print(f"Outbox: paused, the hooks API refused our credentials ({e}); "
+                          f"{self.pending()} message(s) kept for the next run")
+                    continue
+                if e.status not in TRANSIENT_ERRORS and 400 <= e.status < 500:
+                    # The hooks API rejected it; retrying will not help
+                    print(f"Outbox: dropping {len(batch)} message(s), rejected with {e}")
+                    self._ack(batch, "drop")
+                    self.failed += len(batch)
+                    continue
+                self._wait_retry(backoff, e)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            except Exception as e:
+                self._wait_retry(backoff, e)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            backoff = 1.0
+            self.delivered += len(batch)
+            self._ack(batch, "ack")
+
+    def _ack(self, batch, op):
+        with self._cond:
+            self._append([{"op": op, "id": entry["id"]} for entry in batch])
+            ids = {entry["id"] for entry in batch}
+            self._pending = [entry for entry in self._pending if entry["id"] not in ids]
+            self._batch = None
+            if not self._pending:
+                self._compact()
+            self._cond.notify_all()
+
+    def _wait_retry(self, backoff, error):
+        self.retries += 1
+        delay = random.uniform(backoff / 2, backoff)
+        if backoff == 1.0:  # Only report the first failure of a streak
+            print(f"Outbox: delivery failed ({error}); {self.pending()} pending, retrying in the background")
+        with self._cond:
+            if not self._stopping:
+                self._cond.wait(delay)
+
+    def stats(self):
+        return {
+            "pending": self.pending(),
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "retries": self.retries,
+            "paused": self.paused,
+        }
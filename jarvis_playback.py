@@ -0,0 +1,314 @@
+"""
+Jarvis Playback - in-process audio output for synthesized speech
+One persistent output stream plays 16-bit mono PCM straight from memory.
+Clips are queued and played back to back; a stream clip can be written to
+while it plays, with a small jitter buffer so late chunks do not stutter.
+Stopping takes effect at the next block, and the samples actually played
+are counted exactly. Backends: "device" (PyAudio), "null" and "file:PATH"
+(both clocked in software, for headless runs); "null:SPEED" and
+"file:PATH:SPEED" run the clock SPEED times faster than real time.
+"""
+
+import asyncio
+import threading
+import time
+import wave
+from collections import deque
+
+SAMPLE_WIDTH = 2  # 16-bit mono
+
+
+class Clip:
+    """Queued audio; write() more while it plays if opened as a stream"""
+
+    def __init__(self, player, pcm=b"", streaming=False):
+        self._player = player
+        self._buffer = bytearray(pcm)
+        self._pos = 0  # Bytes of _buffer already played
+        self._primed = False  # Jitter buffer filled; reset after an underrun
+        self.closed = not streaming
+        self.played = 0  # Samples handed to the output
+        self.underruns = 0
+        self.stopped = False
+        self.started_at = None  # perf_counter() when its first sample was played
+        self._done = threading.Event()
+        self._callbacks = []
+
+    def buffered(self):
+        """Samples written but not played yet"""
+        return (len(self._buffer) - self._pos) // SAMPLE_WIDTH
+
+    def write(self, pcm):
+        with self._player._lock:
+            if self.closed:
+                raise ValueError("write to a closed clip")
+            self._buffer += pcm
+
+    def close(self):
+        """No more audio will be written; the clip finishes once what is buffered has played"""
+        with self._player._lock:
+            self.closed = True
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def add_done_callback(self, callback):
+        """Call callback(clip) from the audio thread once the clip has finished or been stopped"""
+        with self._player._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    async def wait_async(self):
+        loop = asyncio.get_running_loop()
+        finished = loop.create_future()
+
+        def resolve():
+            if not finished.done():
+                finished.set_result(None)
+
+        self.add_done_callback(lambda clip: loop.call_soon_threadsafe(resolve))
+        await finished
+
+    def _finish(self):
+        """Mark the clip done (with the player lock held); returns the callbacks to run"""
+        self._done.set()
+        callbacks, self._callbacks = self._callbacks, []
+        return [lambda callback=callback: callback(self) for callback in callbacks]
+
+
+class Player:
+    def __init__(self, backend, sample_rate=24000, block_ms=10, prebuffer_ms=80):
+        """backend: a backend spec string ("device", "null", "file:PATH") or backend object"""
+        self.sample_rate = sample_rate
+        self.block_frames = sample_rate * block_ms // 1000
+        self.prebuffer_bytes = sample_rate * prebuffer_ms // 1000 * SAMPLE_WIDTH
+        self.backend = open_backend(backend) if isinstance(backend, str) else backend
+        self.clips_played = 0
+        self.clips_stopped = 0
+        self.samples_played = 0
+        self.underruns = 0
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        """Open the output stream (idempotent); it stays open, playing silence when idle"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.backend.start(self._render, self.sample_rate, self.block_frames)
+
+    def play(self, pcm):
+        """Queue a complete clip; returns the Clip"""
+        return self._enqueue(Clip(self, pcm))
+
+    def open_stream(self):
+        """Queue a clip to be written to while it plays; close() it when done"""
+        return self._enqueue(Clip(self, streaming=True))
+
+    def _enqueue(self, clip):
+        self.start()
+        with self._lock:
+            self._queue.append(clip)
+        return clip
+
+    def stop(self, clip=None):
+        """Stop clip (or everything queued) at the next block boundary"""
+        callbacks = []
+        with self._lock:
+            targets = list(self._queue) if clip is None else [clip] if clip in self._queue else []
+            for target in targets:
+                self._queue.remove(target)
+                target.stopped = True
+                self.clips_stopped += 1
+                callbacks += target._finish()
+        for callback in callbacks:
+            callback()
+        return len(targets)
+
+    def busy(self):
+        with self._lock:
+            return bool(self._queue)
+
+    def _render(self, frames):
+        """Produce the next block of output (called from the audio thread)
+
+        Returns (pcm, active); pcm is padded with silence if nothing is playing.
+        """
+        need = frames * SAMPLE_WIDTH
+        out = bytearray()
+        callbacks = []
+        with self._lock:
+            while need and self._queue:
+                clip = self._queue[0]
+                available = len(clip._buffer) - clip._pos
+                if not clip._primed:
+                    if not clip.closed and available < self.prebuffer_bytes:
+                        break  # Filling the jitter buffer
+                    clip._primed = True
+                if available == 0:
+                    if clip.closed:
+                        self._queue.popleft()
+                        self.clips_played += 1
+                        callbacks += clip._finish()
+                        continue
+                    # Writer fell behind: play silence and refill the jitter buffer before resuming
+                    clip._primed = False
+                    clip.underruns += 1
+                    self.underruns += 1
+                    break
+
+                take = min(available, need)
+                if clip.started_at is None:
+                    clip.started_at = time.perf_counter()
+                out += clip._buffer[clip._pos:clip._pos + take]
+                clip._pos += take
+                clip.played += take // SAMPLE_WIDTH
+                self.samples_played += take // SAMPLE_WIDTH
+                need -= take
+                if clip._pos >= 1 << 16:
+                    del clip._buffer[:clip._pos]
+                    clip._pos = 0
+        active = bool(out)
+        out += bytes(need)
+        for callback in callbacks:
+            callback()
+        return bytes(out), active
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": len(self._queue),
+                "clips_played": self.clips_played,
+                "clips_stopped": self.clips_stopped,
+                "seconds_played": round(self.samples_played / self.sample_rate, 3),
+                "underruns": self.underruns,
+                "device_underflows": getattr(self.backend, "underflows", 0),
+            }
+
+    def close(self):
+        self.stop()
+        if self._started:
+            self.backend.close()
+
+
+class DeviceBackend:
+    """The default output device, through a PyAudio callback stream"""
+
+    def __init__(self):
+        self.underflows = 0  # Reported by the device: a block was not ready in time
+        self._pyaudio = None
+        self._stream = None
+
+    def start(self, render, sample_rate, block_frames):
+        import pyaudio
+
+        def callback(in_data, frame_count, time_info, status):
+            if status & pyaudio.paOutputUnderflow:
+                self.underflows += 1
+            return render(frame_count)[0], pyaudio.paContinue
+
+        self._pyaudio = pyaudio.PyAudio()
+        self._stream = self._pyaudio.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=sample_rate,
+            output=True,
+            frames_per_buffer=block_frames,
+            stream_callback=callback,
+        )
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._pyaudio.terminate()
+
+
+class ClockedBackend:
+    """Pulls blocks on a software clock; subclasses decide where the audio goes"""
+
+    def __init__(self, speed=1.0):
+        self.speed = speed
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self, render, sample_rate, block_frames):
+        interval = block_frames / sample_rate / self.speed
+
+        def run():
+            deadline = time.monotonic()
+            while not self._stopping.is_set():
+                pcm, active = render(block_frames)
+                if active:
+                    self.sink(pcm)
+                deadline += interval
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    self._stopping.wait(delay)
+                else:
+                    deadline = time.monotonic()  # Fell behind (e.g. a slow disk); do not try to catch up
+
+        self.open(sample_rate)
+        self._thread = threading.Thread(target=run, daemon=True, name="jarvis-playback")
+        self._thread.start()
+
+    def open(self, sample_rate):
+        pass
+
+    def sink(self, pcm):
+        pass
+
+    def close(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+
+class NullBackend(ClockedBackend):
+    """Discards the audio, but plays it for as long as a device would"""
+
+
+class FileBackend(ClockedBackend):
+    """Writes everything that was played (idle silence excluded) to a WAV file"""
+
+    def __init__(self, path, speed=1.0):
+        super().__init__(speed)
+        self.path = path
+        self._wav = None
+
+    def open(self, sample_rate):
+        self._wav = wave.open(self.path, 'wb')
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(SAMPLE_WIDTH)
+        self._wav.setframerate(sample_rate)
+
+    def sink(self, pcm):
+        self._wav.writeframes(pcm)
+
+    def close(self):
+        super().close()
+        if self._wav is not None:
+            self._wav.close()
+
+
+def open_backend(spec):
+    """Backend from a spec: "device", "null[:SPEED]" or "file:PATH[:SPEED]" """
+    kind, _, rest = spec.partition(":")
+    if kind == "device":
+        return DeviceBackend()
+    if kind == "null":
+        return NullBackend(float(rest or 1))
+    if kind == "file" and rest:
+        path, _, speed = rest.rpartition(":")
+        if not (path and speed.replace(".", "", 1).isdigit()):
+            path, speed = rest, 1
+        return FileBackend(path, float(speed))
+    raise ValueError(f"unknown audio output {spec!r} (expected device, null[:SPEED] or file:PATH[:SPEED])")
@@ -0,0 +1,48 @@
+"""
+Jarvis Ready - readiness helpers shared by the supervisor and its components
+Components started by jarvis_supervisor.py report readiness over a Unix
+datagram socket named in JARVIS_NOTIFY_SOCKET (similar to sd_notify).
+"""
+
+import os
+import socket
+import time
+
+NOTIFY_SOCKET_ENV = "JARVIS_NOTIFY_SOCKET"
+
+
+def notify_ready(name):
+    """Tell the supervisor, if there is one, that this component is ready"""
+    path = os.environ.get(NOTIFY_SOCKET_ENV)
+    if not path:
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        try:
+            sock.sendto(name.encode('utf-8'), path)
+        except OSError:
+            pass
+
+
+def port_open(port, host="127.0.0.1", timeout=0.2):
+    """Whether something is accepting TCP connections on host:port"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def wait_for_port(port, timeout, host="127.0.0.1", interval=0.05, abort=None):
+    """Poll until host:port accepts connections; returns False on timeout
+
+    abort, if given, is checked on every poll; once it returns true (e.g. the
+    process that should open the port has exited) the wait gives up early.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if port_open(port, host):
+            return True
+        if abort is not None and abort():
+            return False
+        time.sleep(interval)
+    return False
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Jarvis Supervisor - starts the SSH tunnel, Jarvis Eye and the voice interface
+All three start at once; instead of fixed sleeps each one counts as ready on
+a real signal: the tunnel when its port accepts connections, the eye when its
+first frame is on screen and the voice interface when its gateway handshake
+succeeds. Crashed components are restarted with backoff.
+"""
+
+import asyncio
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from jarvis_ready import NOTIFY_SOCKET_ENV, port_open
+
+# Configuration - set these in a .env file or as environment variables
+VPS_HOST = os.environ.get("JARVIS_VPS_HOST", "")
+SSH_TUNNEL_PORT = int(os.environ.get("JARVIS_SSH_TUNNEL_PORT", "18790"))
+READY_TIMEOUT = float(os.environ.get("JARVIS_READY_TIMEOUT", "30"))  # Warn if not ready by then
+RESTART_MAX_BACKOFF = 30.0
+STABLE_AFTER = 60.0  # A component that ran this long before crashing restarts without backoff
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Component:
+    def __init__(self, name, argv, ready_port=None, ends_session=False):
+        """ready_port: ready once it accepts connections; otherwise the process calls notify_ready(name)
+
+        ends_session: a clean exit (e.g. Escape in the voice interface) stops everything.
+        """
+        self.name = name
+        self.argv = argv
+        self.ready_port = ready_port
+        self.ends_session = ends_session
+        self.process = None
+        self.launched = None
+        self.ready = asyncio.Event()
+        self.ready_after = None  # Seconds from launch to ready, for the latest launch
+        self.restarts = 0
+
+
+class Supervisor:
+    def __init__(self, components):
+        self.components = {component.name: component for component in components}
+        self.started = time.perf_counter()
+        self.stopping = False
+        self._notify_dir = tempfile.mkdtemp(prefix="jarvis-")
+        self.notify_path = os.path.join(self._notify_dir, "notify.sock")
+
+    def _mark_ready(self, component):
+        if component.ready.is_set():
+            return
+        component.ready_after = time.perf_counter() - component.launched
+        component.ready.set()
+        print(f"Supervisor: {component.name} ready in {component.ready_after:.2f}s")
+
+    def _on_notify(self, sock):
+        try:
+            name = sock.recv(256).decode('utf-8', 'replace')
+        except OSError:
+            return
+        component = self.components.get(name)
+        if component is not None and component.process is not None:
+            self._mark_ready(component)
+
+    async def _wait_for_port(self, component):
+        while component.process.returncode is None:
+            if await asyncio.to_thread(port_open, component.ready_port):
+                self._mark_ready(component)
+                return
+            await asyncio.sleep(0.05)
+
+    async def supervise(self, component):
+        env = dict(os.environ, **{NOTIFY_SOCKET_ENV: self.notify_path})
+        backoff = 1.0
+        while not self.stopping:
+            component.ready.clear()
+            component.launched = time.perf_counter()
+            component.process = await asyncio.create_subprocess_exec(*component.argv, env=env, cwd=SCRIPT_DIR)
+            watcher = asyncio.create_task(self._wait_for_port(component)) if component.ready_port else None
+            code = await component.process.wait()
+            if watcher is not None:
+                watcher.cancel()
+            if self.stopping:
+                return
+            if code == 0:
+                if component.ends_session:
+                    self.stop()
+                else:
+                    print(f"Supervisor: {component.name} exited")
+                return
+
+            if time.perf_counter() - component.launched > STABLE_AFTER:
+                backoff = 1.0
+            component.restarts += 1
+            print(f"Supervisor: {component.name} exited with status {code}; restarting in {backoff:.0f}s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, RESTART_MAX_BACKOFF)
+
+    async def report_ready(self):
+        """Print the time until every component first became ready"""
+        waits = [component.ready.wait() for component in self.components.values()]
+        try:
+            await asyncio.wait_for(asyncio.gather(*waits), READY_TIMEOUT)
+        except asyncio.TimeoutError:
+            waiting = [name for name, component in self.components.items() if not component.ready.is_set()]
+            print(f"Supervisor: still waiting for {', '.join(waiting)} after {READY_TIMEOUT:.0f}s")
+            await asyncio.gather(*(component.ready.wait() for component in self.components.values()))
+
+        total = time.perf_counter() - self.started
+        parts = ", ".join(
+            f"{name} {component.ready_after:.2f}s" if component.ready_after is not None else f"{name} external"
+            for name, component in self.components.items()
+        )
+        print(f"\nJarvis ready in {total:.2f}s ({parts})\n")
+
+    def stop(self):
+        if self.stopping:
+            return
+        self.stopping = True
+        for component in self.components.values():
+            if component.process is not None and component.process.returncode is None:
+                component.process.terminate()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self.stop)
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(self.notify_path)
+        sock.setblocking(False)
+        loop.add_reader(sock.fileno(), self._on_notify, sock)
+
+        supervised = [component for component in self.components.values() if component.argv]
+        for component in self.components.values():
+            if not component.argv:
+                component.ready.set()  # Already running outside our control
+
+        reporter = asyncio.create_task(self.report_ready())
+        try:
+            await asyncio.gather(*(self.supervise(component) for component in supervised))
+        finally:
+            self.stop()
+            reporter.cancel()
+            loop.remove_reader(sock.fileno())
+            sock.close()
+            shutil.rmtree(self._notify_dir, ignore_errors=True)
+            for component in supervised:
+                if component.process is not None:
+                    await component.process.wait()
+
+
+def kill_stale_eye():
+    """Close an eye left over from an earlier or crashed session
+
+    It would stay on screen next to ours and could never report ready to us.
+    """
+    # Only Python running the script, not e.g. an editor with jarvis_eye.py open
+    pattern = r"^[^ ]*[Pp]ython[0-9.]*( -[^ ]+)* [^ ]*jarvis_eye\.py( |$)"
+    if subprocess.run(["pkill", "-f", pattern], stderr=subprocess.DEVNULL).returncode == 0:
+        print("Stopped a Jarvis Eye left over from an earlier session")
+
+
+def build_components():
+    tunnel = Component("tunnel", None)
+    if port_open(SSH_TUNNEL_PORT):
+        print(f"SSH tunnel already running on port {SSH_TUNNEL_PORT}")
+    elif not VPS_HOST:
+        print("Error: JARVIS_VPS_HOST not set. Copy .env.example to .env and fill in your values.")
+        return None
+    else:
+        # ExitOnForwardFailure and keepalives make a broken tunnel exit, so it gets restarted
+        tunnel = Component("tunnel", [
+            "ssh", "-N",
+            "-o", "ExitOnForwardFailure=yes",
+            "-o", "ServerAliveInterval=15",
+            "-o", "ServerAliveCountMax=3",
+            "-L", f"{SSH_TUNNEL_PORT}:127.0.0.1:18789",
+            f"root@{VPS_HOST}",
+        ], ready_port=SSH_TUNNEL_PORT)
+
+    return [
+        tunnel,
+        Component("eye", [sys.executable, os.path.join(SCRIPT_DIR, "jarvis_eye.py")]),
+        Component("voice", [sys.executable, os.path.join(SCRIPT_DIR, "jarvis_voice_full.py")], ends_session=True),
+    ]
+
+
+def main():
+    print("=" * 34)
+    print("  Starting Jarvis Eye + Voice")
+    print("=" * 34 + "\n")
+
+    components = build_components()
+    if components is None:
+        return 1
+    kill_stale_eye()
+    asyncio.run(Supervisor(components).run())
+    print("Done.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
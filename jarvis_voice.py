@@ -8,10 +8,11 @@ import subprocess
 import tempfile
 import os
 import json
-import urllib.request
-import urllib.error
 import threading
-import time
+
+from jarvis_http import HTTPClient
+from jarvis_outbox import Outbox, Rejected
+from jarvis_ready import port_open, wait_for_port
 
 # Configuration - set these in a .env file or as environment variables
 VPS_HOST = os.environ.get("JARVIS_VPS_HOST", "")
@@ -21,17 +22,16 @@ SSH_TUNNEL_PORT = int(os.environ.get("JARVIS_SSH_TUNNEL_PORT", "18790"))
 HOOKS_URL = f"http://127.0.0.1:18789/hooks/agent"
 LOCAL_API_URL = f"http://127.0.0.1:{SSH_TUNNEL_PORT}/hooks/agent"
 
+# Outbox - messages wait here until the tunnel is up
+OUTBOX_PATH = os.environ.get("JARVIS_OUTBOX_PATH", os.path.expanduser("~/.cache/jarvis/outbox.jsonl"))
+# More than 1 joins messages queued while offline into a single agent message
+OUTBOX_BATCH_SIZE = int(os.environ.get("JARVIS_OUTBOX_BATCH_SIZE", "1"))
+TUNNEL_READY_TIMEOUT = float(os.environ.get("JARVIS_TUNNEL_READY_TIMEOUT", "15"))
+
 
 def check_tunnel_exists():
-    """Check if SSH tunnel is already running"""
-    try:
-        result = subprocess.run(
-            ["pgrep", "-f", f"ssh.*{SSH_TUNNEL_PORT}.*{VPS_HOST}"],
-            capture_output=True
-        )
-        return result.returncode == 0
-    except:
-        return False
+    """Check if the SSH tunnel is already accepting connections"""
+    return port_open(SSH_TUNNEL_PORT)
 
 
 def setup_ssh_tunnel():
@@ -42,14 +42,26 @@ def setup_ssh_tunnel():
 
     print("Setting up SSH tunnel to VPS...")
     tunnel = subprocess.Popen(
-        ["ssh", "-N", "-L", f"{SSH_TUNNEL_PORT}:127.0.0.1:18789", f"root@{VPS_HOST}"],
+        ["ssh", "-N", "-o", "ExitOnForwardFailure=yes",
+         "-L", f"{SSH_TUNNEL_PORT}:127.0.0.1:18789", f"root@{VPS_HOST}"],
         stdout=subprocess.DEVNULL,
         stderr=subprocess.DEVNULL
     )
-    time.sleep(3)  # Wait for tunnel to establish
+    # Report in the background; the outbox holds messages until the tunnel is up
+    threading.Thread(target=report_tunnel, args=(tunnel,), daemon=True).start()
     return tunnel
 
 
+def report_tunnel(tunnel):
+    """Say whether the tunnel came up, giving up as soon as ssh exits"""
+    if wait_for_port(SSH_TUNNEL_PORT, TUNNEL_READY_TIMEOUT, abort=lambda: tunnel.poll() is not None):
+        print("SSH tunnel connected.")
+    elif tunnel.poll() is not None:
+        print(f"SSH tunnel exited with status {tunnel.returncode}; messages will wait in the outbox.")
+    else:
+        print("SSH tunnel not up yet; messages will wait in the outbox.")
+
+
 def speech_to_text_macos(audio_file):
     """Use macOS Speech Recognition"""
     # For now, we'll use a simpler approach with the 'say' command for TTS
@@ -81,10 +93,10 @@ def record_audio_macos(duration=5):
     return audio_file
 
 
-def send_to_clawdbot(message):
-    """Send message to clawdbot via hooks API through SSH tunnel"""
+def deliver_to_clawdbot(entries, idempotency_key):
+    """Deliver outbox entries to clawdbot via hooks API through SSH tunnel"""
     payload = {
-        "message": message,
+        "message": "\n\n".join(entry["message"] for entry in entries),
         "channel": "telegram",
         "to": TELEGRAM_CHAT_ID,
         "deliver": True,
@@ -93,25 +105,26 @@ def send_to_clawdbot(message):
 
     headers = {
         "Authorization": f"Bearer {HOOKS_TOKEN}",
-        "Content-Type": "application/json"
+        "Content-Type": "application/json",
+        "Idempotency-Key": idempotency_key
     }
 
     data = json.dumps(payload).encode('utf-8')
-    req = urllib.request.Request(LOCAL_API_URL, data=data, headers=headers, method='POST')
+    result = hooks_client.request("POST", LOCAL_API_URL, body=data, headers=headers, connect_timeout=3, read_timeout=30)
+    result = json.loads(result.decode('utf-8'))
+    if not result.get('ok'):
+        raise Rejected(result.get('error') or result)
+    print(f"Message sent! Run ID: {result.get('runId')}")
+    return result
+
+
+def send_to_clawdbot(message):
+    """Queue message for clawdbot; it is delivered in the background, even across restarts"""
+    return outbox.put(message)
 
-    try:
-        with urllib.request.urlopen(req, timeout=30) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            if result.get('ok'):
-                print(f"Message sent! Run ID: {result.get('runId')}")
-                return result
-            else:
-                print(f"Error: {result}")
-                return None
-    except urllib.error.URLError as e:
-        print(f"Connection error: {e}")
-        print(f"Make sure SSH tunnel is running: ssh -N -L {SSH_TUNNEL_PORT}:127.0.0.1:18789 root@{VPS_HOST}")
-        return None
+
+hooks_client = HTTPClient()
+outbox = Outbox(OUTBOX_PATH, deliver_to_clawdbot, batch_size=OUTBOX_BATCH_SIZE)
 
 
 def speak_text(text):
@@ -132,6 +145,10 @@ def main_interactive():
     # Setup SSH tunnel
     tunnel = setup_ssh_tunnel()
 
+    if outbox.pending():
+        print(f"{outbox.pending()} message(s) from a previous session still to send.")
+    outbox.start()
+
     try:
         while True:
             try:
@@ -141,19 +158,22 @@ def main_interactive():
                 if not message:
                     continue
 
-                print("Sending to clawdbot...")
-                result = send_to_clawdbot(message)
-
-                if result:
-                    print("Message sent! Check Telegram for response.\n")
+                send_to_clawdbot(message)
+                print(f"Queued ({outbox.pending()} pending). Check Telegram for response.\n")
 
             except KeyboardInterrupt:
                 break
 
     finally:
         print("\nShutting down...")
-        tunnel.terminate()
-        tunnel.wait()
+        outbox.stop()
+        if outbox.pending():
+            print(f"{outbox.pending()} message(s) will be sent next time.")
+        if outbox.paused:
+            print(f"Delivery was paused ({outbox.paused}); check JARVIS_HOOKS_TOKEN.")
+        if tunnel:
+            tunnel.terminate()
+            tunnel.wait()
 
 
 if __name__ == "__main__":
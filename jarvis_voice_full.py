@@ -4,13 +4,15 @@ Jarvis Voice Interface - Full voice control with Gemini STT/TTS
 Press and hold Right Command to talk, release to send
 """
 
+import asyncio
 import subprocess
 import threading
 import queue
 import time
 import json
-import urllib.request
-import urllib.error
+import re
+import uuid
+import ssl
 import tempfile
 import os
 import wave
@@ -20,11 +22,18 @@ import pyaudio
 import base64
 
 # WebSocket
-import websockets
+from websockets.asyncio.client import connect as ws_connect
 
 # Keyboard listener
 from pynput import keyboard
 
+from jarvis_hedge import Hedger
+from jarvis_http import Cancellation, HTTPClient, RequestCancelled
+from jarvis_metrics import Metrics, Trace, current_trace
+from jarvis_playback import Player
+from jarvis_ready import notify_ready
+from jarvis_tts_cache import TTSCache
+
 # Configuration - set these in a .env file or as environment variables
 VPS_HOST = os.environ.get("JARVIS_VPS_HOST", "")
 HOOKS_TOKEN = os.environ.get("JARVIS_HOOKS_TOKEN", "")
@@ -33,17 +42,62 @@ TELEGRAM_CHAT_ID = os.environ.get("JARVIS_TELEGRAM_CHAT_ID", "")
 SSH_TUNNEL_PORT = int(os.environ.get("JARVIS_SSH_TUNNEL_PORT", "18790"))
 LOCAL_API_URL = f"http://127.0.0.1:{SSH_TUNNEL_PORT}/hooks/agent"
 WS_URL = f"ws://127.0.0.1:{SSH_TUNNEL_PORT}"
+GATEWAY_RETRY_INTERVAL = 0.25  # Seconds between startup handshake attempts
+GATEWAY_WARN_AFTER = 5  # Seconds before telling the user the gateway is unreachable
 
 # Gemini
 GEMINI_API_KEY = os.environ.get("JARVIS_GEMINI_API_KEY", "")
+GEMINI_BASE_URL = os.environ.get("JARVIS_GEMINI_BASE_URL", "https://generativelanguage.googleapis.com")
+GEMINI_CA_FILE = os.environ.get("JARVIS_GEMINI_CA_FILE") or None  # e.g. for a local HTTPS stand-in
+GEMINI_CONNECT_TIMEOUT = float(os.environ.get("JARVIS_GEMINI_CONNECT_TIMEOUT", "5"))
 GEMINI_STT_MODEL = os.environ.get("JARVIS_GEMINI_STT_MODEL", "gemini-2.5-flash-preview-04-17")
 GEMINI_TTS_MODEL = os.environ.get("JARVIS_GEMINI_TTS_MODEL", "gemini-2.5-flash-preview-tts")
 GEMINI_TTS_VOICE = os.environ.get("JARVIS_GEMINI_TTS_VOICE", "Charon")
 
+# STT upload
+STT_PROMPT = "You are a strict speech-to-text transcriber. Listen to this audio and output ONLY the exact words spoken. Do not paraphrase, interpret, summarize, or add anything. If nothing is spoken, output exactly: [EMPTY]"
+STT_UPLOAD_CHUNK = 48 * 1024  # A multiple of 3, so base64 pieces concatenate cleanly
+AUDIO_PLACEHOLDER = "@@AUDIO@@"
+
+# STT hedging: send a backup request (optionally to another model) when the
+# primary is slower than the recent JARVIS_STT_HEDGE_QUANTILE latency
+STT_HEDGE = os.environ.get("JARVIS_STT_HEDGE", "0") == "1"
+GEMINI_STT_HEDGE_MODEL = os.environ.get("JARVIS_GEMINI_STT_HEDGE_MODEL") or GEMINI_STT_MODEL
+STT_HEDGE_QUANTILE = float(os.environ.get("JARVIS_STT_HEDGE_QUANTILE", "0.95"))
+STT_HEDGE_MIN_DELAY = float(os.environ.get("JARVIS_STT_HEDGE_MIN_DELAY", "0.5"))
+
+# TTS cache
+TTS_CACHE_DIR = os.environ.get("JARVIS_TTS_CACHE_DIR", os.path.expanduser("~/.cache/jarvis/tts"))
+TTS_CACHE_MAX_MB = int(os.environ.get("JARVIS_TTS_CACHE_MAX_MB", "50"))
+NOT_UNDERSTOOD_PHRASE = "I didn't catch that"
+NO_RESPONSE_PHRASE = "No response received"
+FIXED_PHRASES = (NOT_UNDERSTOOD_PHRASE, NO_RESPONSE_PHRASE)
+
+# Metrics
+METRICS_FILE = os.environ.get("JARVIS_METRICS_FILE", os.path.expanduser("~/.cache/jarvis/metrics.jsonl"))
+METRICS_FILE_MAX_MB = int(os.environ.get("JARVIS_METRICS_FILE_MAX_MB", "10"))  # Then rotated to <file>.1
+METRICS_PORT = int(os.environ.get("JARVIS_METRICS_PORT", "0"))  # 0 disables the Prometheus endpoint
+
 # Audio settings
 SAMPLE_RATE = 44100
 CHANNELS = 1
 CHUNK = 1024
+TTS_SAMPLE_RATE = 24000
+AUDIO_OUTPUT = os.environ.get("JARVIS_AUDIO_OUTPUT", "device")  # Or "null[:SPEED]" / "file:PATH[:SPEED]", see jarvis_playback
+
+# Pipeline settings
+PIPELINE_QUEUE_SIZE = int(os.environ.get("JARVIS_PIPELINE_QUEUE_SIZE", "4"))
+TTS_CHUNK_CHARS = int(os.environ.get("JARVIS_TTS_CHUNK_CHARS", "200"))
+TTS_CONCURRENCY = int(os.environ.get("JARVIS_TTS_CONCURRENCY", "3"))
+AGENT_STREAMING = os.environ.get("JARVIS_AGENT_STREAMING", "1") == "1"
+
+# Utterance scheduling: "supersede" cancels older utterances when a new one
+# arrives, "queue" processes them in order behind each other
+UTTERANCE_POLICY = os.environ.get("JARVIS_UTTERANCE_POLICY", "supersede")
+UTTERANCE_WORKERS = int(os.environ.get("JARVIS_UTTERANCE_WORKERS", "2"))
+UTTERANCE_QUEUE_SIZE = int(os.environ.get("JARVIS_UTTERANCE_QUEUE_SIZE", "3"))
+UTTERANCE_MAX_AGE = float(os.environ.get("JARVIS_UTTERANCE_MAX_AGE", "30"))
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+|\n+')
 
 # State
 is_recording = False
@@ -97,44 +151,107 @@ class AudioRecorder:
         wf.setnchannels(CHANNELS)
         wf.setsampwidth(sample_width)
         wf.setframerate(SAMPLE_RATE)
-        wf.writeframes(b''.join(frames))
+        # Write frame by frame rather than joining them into another copy
+        for frame in frames:
+            wf.writeframesraw(frame)
         wf.close()
         return filename
 
 
-def speech_to_text(audio_file):
-    """Convert audio to text using Gemini"""
+def gemini_generate(model, payload, timeout, cancel=None):
+    """POST a generateContent request through the shared keep-alive client
+
+    payload is the request dict, or a callable returning the JSON body as an
+    iterable of bytes to stream (see stt_request_body).
+    """
+    url = f"{GEMINI_BASE_URL}/v1beta/models/{model}:generateContent?key={GEMINI_API_KEY}"
+    data = http_client.request(
+        "POST", url,
+        body=payload if callable(payload) else json.dumps(payload).encode('utf-8'),
+        headers={"Content-Type": "application/json"},
+        read_timeout=timeout,
+        cancel=cancel,
+    )
+    return json.loads(data.decode('utf-8'))
+
+
+async def to_thread_cancellable(func, *args):
+    """asyncio.to_thread(func, *args, cancel=...) that aborts func's HTTP requests if the task is cancelled"""
+    cancel = Cancellation()
     try:
-        with open(audio_file, 'rb') as f:
-            audio_b64 = base64.b64encode(f.read()).decode('utf-8')
-
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_STT_MODEL}:generateContent?key={GEMINI_API_KEY}"
-
-        payload = {
-            "contents": [{
-                "parts": [
-                    {"text": "You are a strict speech-to-text transcriber. Listen to this audio and output ONLY the exact words spoken. Do not paraphrase, interpret, summarize, or add anything. If nothing is spoken, output exactly: [EMPTY]"},
-                    {"inline_data": {"mime_type": "audio/wav", "data": audio_b64}}
-                ]
-            }],
-            "generationConfig": {
-                "temperature": 0,
-                "maxOutputTokens": 500
-            }
+        return await asyncio.to_thread(func, *args, cancel=cancel)
+    except asyncio.CancelledError:
+        cancel.cancel()
+        raise
+
+
+def warm_up_gemini():
+    """Open a connection to Gemini ahead of the first utterance"""
+    try:
+        http_client.warm_up(GEMINI_BASE_URL)
+    except OSError as e:
+        print(f"Gemini warm-up failed: {e}")
+
+
+def stt_request_body(audio_file):
+    """Yield the STT request JSON piece by piece, base64-encoding the audio as it is read
+
+    Only one STT_UPLOAD_CHUNK of audio is in memory at a time, instead of the
+    whole recording plus its base64, JSON and encoded copies.
+    """
+    payload = {
+        "contents": [{
+            "parts": [
+                {"text": STT_PROMPT},
+                {"inline_data": {"mime_type": "audio/wav", "data": AUDIO_PLACEHOLDER}}
+            ]
+        }],
+        "generationConfig": {
+            "temperature": 0,
+            "maxOutputTokens": 500
         }
+    }
+    head, tail = json.dumps(payload).split(AUDIO_PLACEHOLDER)
+    yield head.encode('utf-8')
+    with open(audio_file, 'rb') as f:
+        while chunk := f.read(STT_UPLOAD_CHUNK):
+            yield base64.b64encode(chunk)
+    yield tail.encode('utf-8')
+
+
+def transcribe_file(audio_file, model=None, cancel=None):
+    """Transcribe a WAV file with Gemini, returning "" if nothing was spoken
+
+    Hedged across models if STT_HEDGE is on and no model is given. Raises
+    on network or response errors, and RequestCancelled if cancel fires.
+    """
+    def transcribe(stt_model, cancel=None):
+        result = gemini_generate(stt_model, lambda: stt_request_body(audio_file), timeout=15, cancel=cancel)
+        return result["candidates"][0]["content"]["parts"][0]["text"].strip()
+
+    if STT_HEDGE and model is None:
+        text = stt_hedger.call(
+            lambda cancel: transcribe(GEMINI_STT_MODEL, cancel),
+            lambda cancel: transcribe(GEMINI_STT_HEDGE_MODEL, cancel),
+            cancel=cancel,
+        )
+    else:
+        text = transcribe(model or GEMINI_STT_MODEL, cancel)
+    return "" if text == "[EMPTY]" else text
 
-        data = json.dumps(payload).encode('utf-8')
-        req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"}, method='POST')
 
-        with urllib.request.urlopen(req, timeout=15) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            text = result["candidates"][0]["content"]["parts"][0]["text"].strip()
-            if text and text != "[EMPTY]":
-                print(f"You said: {text}")
-                return text
-            else:
-                print("Could not understand audio")
-                return None
+def speech_to_text(audio_file, model=None, cancel=None):
+    """Convert audio to text using Gemini"""
+    try:
+        text = transcribe_file(audio_file, model, cancel)
+        if text:
+            print(f"You said: {text}")
+            return text
+        else:
+            print("Could not understand audio")
+            return None
+    except RequestCancelled:
+        raise
     except (TimeoutError, OSError) as e:
         print(f"Network timeout: {e}")
         return None
@@ -143,44 +260,105 @@ def speech_to_text(audio_file):
         return None
 
 
-def send_to_clawdbot(message):
-    """Send message to clawdbot via WebSocket and get the response"""
-    from websockets.sync.client import connect as ws_connect
-    import uuid
-    req_id = str(uuid.uuid4())
-    connect_id = str(uuid.uuid4())
+class SentenceBuffer:
+    """Assembles streamed assistant text and releases it one complete sentence at a time"""
+
+    def __init__(self):
+        self.text = ""
+        self.emitted = 0  # Length of self.text already handed downstream
+
+    def update(self, text=None, delta=None):
+        """Add streamed text (a delta or the full text so far); return newly completed sentences"""
+        if delta:
+            self.text += delta
+        elif text and text.startswith(self.text[:self.emitted]):
+            self.text = text
+        breaks = list(SENTENCE_BREAK.finditer(self.text, self.emitted))
+        if not breaks:
+            return ""
+        end = breaks[-1].end()
+        completed = self.text[self.emitted:end].strip()
+        self.emitted = end
+        return completed
+
+    def finish(self, final_text):
+        """Return whatever part of the final reply has not been handed downstream yet"""
+        spoken = self.text[:self.emitted]
+        if final_text and final_text.startswith(spoken):
+            return final_text[self.emitted:].strip()
+        if not self.emitted:
+            return (final_text or "").strip()
+        return self.text[self.emitted:].strip()
+
+
+def agent_event_text(frame, run_ids):
+    """Extract (text, delta) from a streaming assistant event for one of run_ids, else None"""
+    if frame.get("type") != "event" or frame.get("event") != "agent":
+        return None
+    payload = frame.get("payload") or {}
+    if payload.get("runId") not in run_ids or payload.get("stream") != "assistant":
+        return None
+    data = payload.get("data") or {}
+    return data.get("text"), data.get("delta")
+
+
+async def gateway_handshake(ws):
+    """Send the connect request on an open gateway socket and return its reply"""
+    connect_frame = {
+        "type": "req",
+        "id": str(uuid.uuid4()),
+        "method": "connect",
+        "params": {
+            "minProtocol": 3,
+            "maxProtocol": 3,
+            "client": {
+                "id": "gateway-client",
+                "displayName": "Jarvis Voice",
+                "version": "1.0.0",
+                "platform": "macos",
+                "mode": "backend"
+            },
+            "auth": {
+                "token": GATEWAY_TOKEN
+            },
+            "role": "operator",
+            "scopes": ["operator.admin"]
+        }
+    }
+    await ws.send(json.dumps(connect_frame))
+    return json.loads(await asyncio.wait_for(ws.recv(), timeout=10))
 
+
+async def check_gateway():
+    """Whether the gateway answers a connect handshake through the tunnel"""
     try:
-        with ws_connect(WS_URL, close_timeout=5) as ws:
-            # Step 1: Send connect handshake
-            connect_frame = {
-                "type": "req",
-                "id": connect_id,
-                "method": "connect",
-                "params": {
-                    "minProtocol": 3,
-                    "maxProtocol": 3,
-                    "client": {
-                        "id": "gateway-client",
-                        "displayName": "Jarvis Voice",
-                        "version": "1.0.0",
-                        "platform": "macos",
-                        "mode": "backend"
-                    },
-                    "auth": {
-                        "token": GATEWAY_TOKEN
-                    },
-                    "role": "operator",
-                    "scopes": ["operator.admin"]
-                }
-            }
-            ws.send(json.dumps(connect_frame))
+        async with ws_connect(WS_URL, open_timeout=5, close_timeout=1) as ws:
+            return (await gateway_handshake(ws)).get("ok", True)
+    except Exception:
+        return False
 
-            # Step 2: Wait for hello-ok
-            hello = json.loads(ws.recv(timeout=10))
+
+async def send_to_clawdbot_async(message, on_text=None):
+    """Send message to clawdbot via WebSocket and get the response
+
+    If on_text is given it is awaited with the reply as it becomes available:
+    complete sentences from the run's assistant stream events while the agent
+    is still working (when AGENT_STREAMING is on), then the remainder once the
+    run completes.
+    """
+    req_id = str(uuid.uuid4())
+    run_ids = {req_id}
+    sentences = SentenceBuffer()
+
+    handshake_started = time.perf_counter()
+    try:
+        async with ws_connect(WS_URL, close_timeout=5) as ws:
+            # Steps 1-2: connect handshake, wait for hello-ok
+            hello = await gateway_handshake(ws)
             if not hello.get("ok", True):
                 print(f"WebSocket handshake failed: {hello}")
                 return None
+            metrics.observe("gateway_handshake", time.perf_counter() - handshake_started)
 
             # Step 3: Send agent request
             agent_frame = {
@@ -197,70 +375,94 @@ def send_to_clawdbot(message):
                 }
             }
             print("Sending to clawdbot...")
-            ws.send(json.dumps(agent_frame))
+            await ws.send(json.dumps(agent_frame))
+            agent_started = time.perf_counter()
+            first_sentence = True
 
             # Step 4: Wait for responses (first=accepted, second=completed with result)
-            deadline = time.time() + 120
-            while time.time() < deadline:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + 120
+            while True:
                 try:
-                    raw = ws.recv(timeout=5)
-                    frame = json.loads(raw)
-
-                    # Skip non-response frames (events, ticks, etc.)
-                    if frame.get("type") != "res" or frame.get("id") != req_id:
+                    raw = await asyncio.wait_for(ws.recv(), timeout=deadline - loop.time())
+                except asyncio.TimeoutError:
+                    print("Timed out waiting for response")
+                    return None
+                frame = json.loads(raw)
+
+                # Speak partial assistant text as soon as a sentence completes
+                if on_text is not None and AGENT_STREAMING:
+                    streamed = agent_event_text(frame, run_ids)
+                    if streamed is not None:
+                        completed = sentences.update(*streamed)
+                        if completed:
+                            if first_sentence:
+                                metrics.observe("agent_first_sentence", time.perf_counter() - agent_started)
+                                first_sentence = False
+                            await on_text(completed)
                         continue
 
-                    # Handle validation/auth errors
-                    if not frame.get("ok"):
-                        err = frame.get("error", {})
-                        print(f"Agent request error: {err.get('message', 'unknown')}")
-                        return None
+                # Skip other non-response frames (ticks, etc.)
+                if frame.get("type") != "res" or frame.get("id") != req_id:
+                    continue
 
-                    payload = frame.get("payload", {})
-                    status = payload.get("status")
+                # Handle validation/auth errors
+                if not frame.get("ok"):
+                    err = frame.get("error", {})
+                    print(f"Agent request error: {err.get('message', 'unknown')}")
+                    return None
 
-                    if status == "accepted":
-                        run_id = payload.get("runId", "")
-                        print(f"Message sent (run: {run_id[:8]}...)")
-                        print("Waiting for clawdbot response...")
-                        continue
+                payload = frame.get("payload", {})
+                status = payload.get("status")
 
-                    if status == "ok":
-                        # Extract the response text from payloads
-                        result = payload.get("result", {})
-                        payloads = result.get("payloads", [])
-                        texts = []
-                        for p in payloads:
-                            if isinstance(p, dict) and p.get("text"):
-                                texts.append(p["text"])
-                            elif isinstance(p, str):
-                                texts.append(p)
-                        response_text = "\n".join(texts) if texts else None
-                        if response_text:
-                            print(f"Clawdbot: {response_text[:80]}...")
-                        return response_text
-
-                    if status == "error":
-                        print(f"Agent error: {payload.get('summary', 'unknown')}")
-                        return None
-
-                except TimeoutError:
+                if status == "accepted":
+                    run_id = payload.get("runId", "")
+                    run_ids.add(run_id)
+                    print(f"Message sent (run: {run_id[:8]}...)")
+                    print("Waiting for clawdbot response...")
                     continue
 
-            print("Timed out waiting for response")
-            return None
+                if status in ("ok", "error"):
+                    metrics.observe("agent", time.perf_counter() - agent_started)
+
+                if status == "ok":
+                    # Extract the response text from payloads
+                    result = payload.get("result", {})
+                    payloads = result.get("payloads", [])
+                    texts = []
+                    for p in payloads:
+                        if isinstance(p, dict) and p.get("text"):
+                            texts.append(p["text"])
+                        elif isinstance(p, str):
+                            texts.append(p)
+                    response_text = "\n".join(texts) if texts else None
+                    if response_text:
+                        print(f"Clawdbot: {response_text[:80]}...")
+                    if on_text is not None:
+                        remainder = sentences.finish(response_text)
+                        if remainder:
+                            await on_text(remainder)
+                    return response_text
+
+                if status == "error":
+                    print(f"Agent error: {payload.get('summary', 'unknown')}")
+                    return None
 
     except Exception as e:
         print(f"WebSocket error: {e}")
         return None
 
 
-def speak_gemini(text):
-    """Use Gemini TTS to speak text"""
-    print(f"Speaking: {text[:50]}...")
+def send_to_clawdbot(message):
+    """Blocking wrapper around send_to_clawdbot_async"""
+    return asyncio.run(send_to_clawdbot_async(message))
 
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_TTS_MODEL}:generateContent?key={GEMINI_API_KEY}"
 
+def synthesize_gemini(text, cancel=None):
+    """Synthesize text with Gemini TTS, returning raw 24kHz PCM (None on failure)
+
+    Raises RequestCancelled if cancel fires.
+    """
     payload = {
         "contents": [{
             "role": "user",
@@ -278,39 +480,83 @@ def speak_gemini(text):
         }
     }
 
-    data = json.dumps(payload).encode('utf-8')
-    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"}, method='POST')
-
     try:
-        with urllib.request.urlopen(req, timeout=30) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            part = result["candidates"][0]["content"]["parts"][0]
-            # Handle both possible structures
-            if "inline_data" in part:
-                audio_b64 = part["inline_data"]["data"]
-            elif "inlineData" in part:
-                audio_b64 = part["inlineData"]["data"]
-            else:
-                print(f"Unexpected TTS response: {list(part.keys())}")
-                subprocess.run(["say", text])
-                return False
-            audio_bytes = base64.b64decode(audio_b64)
-
-            # Save as WAV (Gemini TTS returns PCM at 24kHz)
-            audio_file = tempfile.mktemp(suffix=".wav")
-            with wave.open(audio_file, 'wb') as wf:
-                wf.setnchannels(1)
-                wf.setsampwidth(2)
-                wf.setframerate(24000)
-                wf.writeframes(audio_bytes)
-
-            subprocess.run(["afplay", audio_file], check=True)
-            os.remove(audio_file)
-            return True
+        result = gemini_generate(GEMINI_TTS_MODEL, payload, timeout=30, cancel=cancel)
+        part = result["candidates"][0]["content"]["parts"][0]
+        # Handle both possible structures
+        if "inline_data" in part:
+            audio_b64 = part["inline_data"]["data"]
+        elif "inlineData" in part:
+            audio_b64 = part["inlineData"]["data"]
+        else:
+            print(f"Unexpected TTS response: {list(part.keys())}")
+            return None
+        return base64.b64decode(audio_b64)
+    except RequestCancelled:
+        raise
     except Exception as e:
         print(f"Gemini TTS error: {e}")
-        subprocess.run(["say", text])
-        return False
+        return None
+
+
+def synthesize_cached(text, cancel=None):
+    """synthesize_gemini, served from the on-disk TTS cache when possible"""
+    key = tts_cache.key(text, GEMINI_TTS_VOICE, GEMINI_TTS_MODEL)
+    audio_bytes = tts_cache.get(key)
+    if audio_bytes is None:
+        audio_bytes = synthesize_gemini(text, cancel)
+        if audio_bytes is not None:
+            tts_cache.put(key, audio_bytes)
+    return audio_bytes
+
+
+def prewarm_tts_cache():
+    """Synthesize the fixed phrases ahead of time so they play without a TTS round trip"""
+    for phrase in FIXED_PHRASES:
+        for chunk in split_sentences(phrase):
+            synthesize_cached(chunk)
+
+
+async def run_player(*args):
+    """Run an audio player subprocess (macOS say), killing it if the task is cancelled
+
+    Skipped unless audio goes to the output device.
+    """
+    if AUDIO_OUTPUT != "device":
+        return 0
+    proc = await asyncio.create_subprocess_exec(*args)
+    try:
+        return await proc.wait()
+    except asyncio.CancelledError:
+        proc.kill()
+        await proc.wait()
+        raise
+
+
+async def finish_stream(stream, requested):
+    """Let a player stream play out what it has buffered
+
+    The time from the first write to the first sample played is recorded as
+    the playback_start span.
+    """
+    stream.close()
+    await stream.wait_async()
+    if stream.started_at is not None:
+        metrics.observe("playback_start", stream.started_at - requested)
+
+
+async def speak_async(text):
+    """Speak text with Gemini TTS, falling back to macOS say"""
+    replies = asyncio.Queue()
+    audio = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    await replies.put(text)
+    await replies.put(None)
+    await run_stages(tts_stage(replies, audio), playback_stage(audio))
+
+
+def speak_gemini(text):
+    """Use Gemini TTS to speak text"""
+    asyncio.run(speak_async(text))
 
 
 def speak_macos(text):
@@ -318,9 +564,351 @@ def speak_macos(text):
     subprocess.run(["say", "-v", "Samantha", text])
 
 
+def transcribe_frames(frames, cancel=None):
+    """Save recorded frames to a temporary WAV and transcribe it"""
+    audio_file = tempfile.mktemp(suffix=".wav")
+    with metrics.span("wav_encode"):
+        recorder.save_wav(frames, audio_file)
+    try:
+        with metrics.span("stt"):
+            return speech_to_text(audio_file, cancel=cancel)
+    finally:
+        os.remove(audio_file)
+
+
+async def stt_stage(frames, transcripts):
+    """Pipeline stage: recorded frames -> transcript ("" if nothing was understood)"""
+    text = await to_thread_cancellable(transcribe_frames, frames)
+    await transcripts.put(text or "")
+    await transcripts.put(None)
+
+
+async def agent_stage(transcripts, replies):
+    """Pipeline stage: transcript -> clawdbot reply text, streamed in sentence-sized pieces"""
+    while (text := await transcripts.get()) is not None:
+        if not text:
+            await replies.put(NOT_UNDERSTOOD_PHRASE)
+            continue
+        spoken = []
+
+        async def speak(segment):
+            spoken.append(segment)
+            await replies.put(segment)
+
+        await send_to_clawdbot_async(text, on_text=speak)
+        if not spoken:
+            await replies.put(NO_RESPONSE_PHRASE)
+    await replies.put(None)
+
+
+def split_sentences(text, max_chars=TTS_CHUNK_CHARS):
+    """Split text into sentence-sized chunks for TTS, breaking overlong sentences at spaces"""
+    chunks = []
+    for sentence in SENTENCE_BREAK.split(text):
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            chunks.append(sentence)
+    return chunks
+
+
+async def synthesize_chunk(text, window):
+    """Synthesize one chunk, releasing its slot in the synthesis window when done"""
+    try:
+        with metrics.span("tts"):
+            return await to_thread_cancellable(synthesize_cached, text)
+    finally:
+        window.release()
+
+
+async def tts_stage(replies, audio):
+    """Pipeline stage: reply text -> in-order (chunk, synthesis task) pairs
+
+    Each reply is split into sentences that are synthesized concurrently, at
+    most TTS_CONCURRENCY at a time, so playback can start on the first one.
+    """
+    window = asyncio.Semaphore(TTS_CONCURRENCY)
+    reply_started = None
+    while (text := await replies.get()) is not None:
+        print(f"Speaking: {text[:50]}...")
+        if reply_started is None:
+            reply_started = time.perf_counter()
+        for chunk in split_sentences(text):
+            await window.acquire()
+            synthesis = asyncio.ensure_future(synthesize_chunk(chunk, window))
+            try:
+                await audio.put((chunk, synthesis, reply_started))
+            except asyncio.CancelledError:
+                synthesis.cancel()
+                raise
+    await audio.put(None)
+
+
+async def playback_stage(audio, turn=None):
+    """Pipeline stage: play synthesized chunks in order, falling back to macOS say
+
+    The chunks of a reply are written to one player stream, so they play back
+    to back; if synthesis falls behind, the player's jitter buffer covers the
+    gap or counts an underrun. Cancelling the stage stops the stream.
+    If turn is given, playback waits for the previous utterance to finish speaking.
+    """
+    first_audio = True
+    stream = None
+    try:
+        while (item := await audio.get()) is not None:
+            text, synthesis, reply_started = item
+            audio_bytes = await synthesis
+            if first_audio:
+                if turn is not None:
+                    await turn.wait()
+                    turn.speaking = True
+                reply_ttfa = time.perf_counter() - reply_started
+                metrics.observe("reply_first_audio", reply_ttfa)
+                trace = current_trace.get()
+                if trace is not None:
+                    metrics.observe("first_audio", trace.elapsed())
+                    print(f"Time to first audio: {reply_ttfa:.2f}s after reply, {trace.elapsed():.2f}s after key release")
+                else:
+                    print(f"Time to first audio: {reply_ttfa:.2f}s")
+                first_audio = False
+            if audio_bytes is None:
+                if stream is not None:
+                    await finish_stream(stream, requested)
+                    stream = None
+                await run_player("say", text)
+            else:
+                if stream is None:
+                    stream, requested = player.open_stream(), time.perf_counter()
+                stream.write(audio_bytes)
+        if stream is not None:
+            await finish_stream(stream, requested)
+            stream = None
+    finally:
+        if stream is not None:
+            player.stop(stream)
+        # Drop synthesis still in flight if playback stops early
+        while not audio.empty():
+            item = audio.get_nowait()
+            if item is not None:
+                item[1].cancel()
+
+
+async def run_stages(*stages):
+    """Run pipeline stages together; if one fails or we are cancelled, cancel the rest"""
+    tasks = [asyncio.ensure_future(stage) for stage in stages]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def process_recording_async(frames, trace=None, turn=None):
+    """Process recorded audio: STT -> clawdbot -> TTS -> playback
+
+    trace ties the per-stage spans to this utterance; it starts at key release.
+    turn (a PlaybackTurn) keeps playback in order with other utterances.
+    """
+    trace = trace or Trace()
+    current_trace.set(trace)
+    transcripts = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    replies = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    audio = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    await run_stages(
+        stt_stage(frames, transcripts),
+        agent_stage(transcripts, replies),
+        tts_stage(replies, audio),
+        playback_stage(audio, turn),
+    )
+    metrics.observe("total", trace.elapsed())
+
+
+def process_recording(frames):
+    """Blocking wrapper around process_recording_async"""
+    asyncio.run(process_recording_async(frames))
+
+
+class PlaybackTurn:
+    """An utterance's place in the playback order"""
+
+    def __init__(self, previous=None, quiet=None):
+        """quiet: an asyncio.Event cleared while the user is talking; playback waits for it"""
+        self.previous = previous
+        self.quiet = quiet
+        self.done = asyncio.get_running_loop().create_future()
+        self.speaking = False
+
+    async def wait(self):
+        """Wait until every earlier utterance has finished speaking and the user is not talking"""
+        if self.previous is not None:
+            await asyncio.shield(self.previous.done)
+        if self.quiet is not None:
+            await self.quiet.wait()
+
+    def release(self):
+        """Mark this utterance finished; later ones may speak once earlier ones have too"""
+        def resolve(_=None):
+            if not self.done.done():
+                self.done.set_result(None)
+
+        if self.previous is not None and not self.previous.done.done():
+            self.previous.done.add_done_callback(resolve)
+        else:
+            resolve()
+        self.previous = None
+
+
+class Utterance:
+    def __init__(self, frames, trace, turn):
+        self.frames = frames
+        self.trace = trace
+        self.turn = turn
+        self.started = False  # Holds a worker slot and has reached the network
+        self.task = None
+
+
+class UtteranceScheduler:
+    """Runs utterances on a background asyncio loop with bounded concurrency and ordered playback
+
+    At most UTTERANCE_WORKERS utterances are processed at once; later ones wait
+    (up to UTTERANCE_QUEUE_SIZE, oldest dropped first) and are dropped if they
+    are older than UTTERANCE_MAX_AGE by the time a worker frees up. With the
+    "supersede" policy a new utterance cancels everything before it.
+    """
+
+    def __init__(self, policy=UTTERANCE_POLICY, workers=UTTERANCE_WORKERS,
+                 max_queued=UTTERANCE_QUEUE_SIZE, max_age=UTTERANCE_MAX_AGE):
+        self.policy = policy
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_age = max_age
+        self.loop = asyncio.new_event_loop()
+        self.active = []  # Unfinished utterances, oldest first
+        self.dropped_stale = 0
+        self.dropped_overflow = 0
+        self.superseded = 0
+        self.interrupted = 0
+        self._slots = None
+        self._quiet = None  # Cleared from barge-in until resume(): replies wait while the user talks
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, frames, trace=None):
+        """Schedule an utterance (called from the keyboard thread)"""
+        asyncio.run_coroutine_threadsafe(self._submit(frames, trace or Trace()), self.loop)
+
+    def barge_in(self):
+        """Stop speaking because the user started talking (called from the keyboard thread)
+
+        Cancels the utterance that is speaking; with the "supersede" policy
+        all in-flight work is cancelled too. Queued replies do not start
+        speaking until resume().
+        """
+        asyncio.run_coroutine_threadsafe(self._barge_in(), self.loop)
+
+    def resume(self):
+        """The user stopped talking; queued replies may speak again (called from the keyboard thread)"""
+        self.loop.call_soon_threadsafe(lambda: self._get_quiet().set())
+
+    def _get_quiet(self):
+        if self._quiet is None:
+            self._quiet = asyncio.Event()
+            self._quiet.set()
+        return self._quiet
+
+    def stats(self):
+        queued = sum(1 for u in self.active if not u.started)
+        return {
+            "queue_depth": queued,
+            "in_flight": len(self.active) - queued,
+            "dropped_stale": self.dropped_stale,
+            "dropped_overflow": self.dropped_overflow,
+            "superseded": self.superseded,
+            "interrupted": self.interrupted,
+        }
+
+    async def _submit(self, frames, trace):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+
+        if self.policy == "supersede" and self.active:
+            self.superseded += len(self.active)
+            await self._cancel(list(self.active))
+        else:
+            waiting = [u for u in self.active if not u.started]
+            while len(waiting) >= self.max_queued:
+                self.dropped_overflow += 1
+                print("Utterance queue full, dropping the oldest waiting one")
+                await self._cancel([waiting.pop(0)])
+
+        previous = self.active[-1].turn if self.active else None
+        utterance = Utterance(frames, trace, PlaybackTurn(previous, self._get_quiet()))
+        utterance.task = asyncio.ensure_future(self._run(utterance))
+        utterance.task.add_done_callback(lambda task: self._finished(utterance, task))
+        self.active.append(utterance)
+
+    async def _run(self, utterance):
+        async with self._slots:
+            if utterance.trace.elapsed() > self.max_age:
+                self.dropped_stale += 1
+                print(f"Dropping stale utterance ({utterance.trace.elapsed():.1f}s old)")
+                return
+            utterance.started = True
+            await process_recording_async(utterance.frames, utterance.trace, utterance.turn)
+
+    def _finished(self, utterance, task):
+        utterance.turn.release()
+        self.active.remove(utterance)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Pipeline error: {task.exception()}")
+
+    async def _barge_in(self):
+        self._get_quiet().clear()
+        if self.policy == "supersede":
+            targets = list(self.active)
+        else:
+            targets = [u for u in self.active if u.turn.speaking]
+        # Only what was playing was interrupted; the rest was superseded by the new utterance
+        speaking = sum(1 for u in targets if u.turn.speaking)
+        self.interrupted += speaking
+        self.superseded += len(targets) - speaking
+        if targets:
+            await self._cancel(targets)
+        if speaking:
+            print("Interrupted")
+
+    @staticmethod
+    async def _cancel(utterances):
+        for utterance in utterances:
+            utterance.task.cancel()
+        await asyncio.gather(*(u.task for u in utterances), return_exceptions=True)
+
+
 # Global recorder
 recorder = AudioRecorder()
+tts_cache = TTSCache(TTS_CACHE_DIR, TTS_CACHE_MAX_MB * 1024 * 1024)
+http_client = HTTPClient(
+    connect_timeout=GEMINI_CONNECT_TIMEOUT,
+    ssl_context=ssl.create_default_context(cafile=GEMINI_CA_FILE),
+)
+stt_hedger = Hedger(quantile=STT_HEDGE_QUANTILE, min_delay=STT_HEDGE_MIN_DELAY)
+metrics = Metrics(jsonl_path=METRICS_FILE or None, max_bytes=METRICS_FILE_MAX_MB * 1024 * 1024)
+metrics.add_collector(lambda: {f"tts_cache_{k}": v for k, v in tts_cache.stats().items()})
+metrics.add_collector(lambda: {f"gemini_http_{k}": v for k, v in http_client.stats().items()})
+metrics.add_collector(lambda: {f"stt_hedge_{k}": v for k, v in stt_hedger.stats().items()})
+player = Player(AUDIO_OUTPUT, sample_rate=TTS_SAMPLE_RATE)
+metrics.add_collector(lambda: {f"playback_{k}": v for k, v in player.stats().items()})
 recording_thread = None
+pipeline = UtteranceScheduler()
+metrics.add_collector(lambda: {f"utterance_{k}": v for k, v in pipeline.stats().items()})
 
 
 def on_press(key):
@@ -332,6 +920,8 @@ def on_press(key):
 
         if rcmd_pressed and not is_recording:
             is_recording = True
+            # Barge-in: stop talking as soon as the user does
+            pipeline.barge_in()
             recording_thread = threading.Thread(target=recorder.start_recording)
             recording_thread.start()
     except:
@@ -347,58 +937,53 @@ def on_release(key):
 
         if is_recording and not rcmd_pressed:
             is_recording = False
-            frames = recorder.stop_recording()
+            trace = Trace()
+            with metrics.span("capture", trace):
+                frames = recorder.stop_recording()
 
-            if recording_thread:
-                recording_thread.join(timeout=1)
+                if recording_thread:
+                    recording_thread.join(timeout=1)
 
             if frames and len(frames) > 10:  # Minimum recording length
-                # Process in background
-                threading.Thread(target=process_recording, args=(frames,)).start()
+                # Process on the pipeline loop
+                pipeline.submit(frames, trace)
             else:
                 print("Recording too short, try again")
+            pipeline.resume()
 
         # Exit on Escape
         if key == keyboard.Key.esc:
-            print("\nGoodbye!")
+            stats = tts_cache.stats()
+            print(f"\nTTS cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+            stats = http_client.stats()
+            print(f"Gemini HTTP: {stats['requests']} requests over {stats['connections_opened']} connections")
+            if STT_HEDGE:
+                stats = stt_hedger.stats()
+                print(f"STT hedging: fired {stats['hedged']}/{stats['calls']}, won {stats['hedge_wins']}, saved ~{stats['saved_seconds']}s")
+            stats = player.stats()
+            print(f"Playback: {stats['seconds_played']}s played, {stats['underruns']} underruns, {stats['clips_stopped']} interrupted")
+            player.close()
+            metrics.close()
+            for stage, summary in metrics.summary().items():
+                print(f"  {stage:<22} n={summary['count']:<4} p50={summary['p50']}ms p95={summary['p95']}ms p99={summary['p99']}ms")
+            print("Goodbye!")
             return False
     except:
         pass
 
 
-def process_recording(frames):
-    """Process recorded audio: STT -> clawdbot -> TTS"""
-    # Save audio
-    audio_file = tempfile.mktemp(suffix=".wav")
-    recorder.save_wav(frames, audio_file)
-
-    # Speech to text
-    text = speech_to_text(audio_file)
-    os.remove(audio_file)
-
-    if not text:
-        speak_gemini("I didn't catch that")
-        return
-
-    # Send to clawdbot and get response directly via WebSocket
-    reply = send_to_clawdbot(text)
-
-    if reply:
-        speak_gemini(reply)
-    else:
-        speak_gemini("No response received")
-
-
-def check_ssh_tunnel():
-    """Check if SSH tunnel is running"""
-    try:
-        result = subprocess.run(
-            ["pgrep", "-f", f"ssh.*{SSH_TUNNEL_PORT}.*{VPS_HOST}"],
-            capture_output=True
-        )
-        return result.returncode == 0
-    except:
-        return False
+def wait_for_gateway():
+    """Retry the gateway handshake until it succeeds, then report readiness"""
+    started = time.perf_counter()
+    warned = False
+    while not asyncio.run(check_gateway()):
+        if not warned and time.perf_counter() - started > GATEWAY_WARN_AFTER:
+            print("Gateway not reachable yet, still trying...")
+            print(f"  Is the tunnel up? ssh -N -L {SSH_TUNNEL_PORT}:127.0.0.1:18789 root@{VPS_HOST}\n")
+            warned = True
+        time.sleep(GATEWAY_RETRY_INTERVAL)
+    print(f"Gateway connected ({time.perf_counter() - started:.2f}s)\n")
+    notify_ready("voice")
 
 
 def main():
@@ -411,13 +996,14 @@ def main():
     print("  Press Escape to quit")
     print("\n" + "="*50 + "\n")
 
-    # Check SSH tunnel
-    if not check_ssh_tunnel():
-        print("SSH tunnel not running!")
-        print(f"  Run: ssh -f -N -L {SSH_TUNNEL_PORT}:127.0.0.1:18789 root@{VPS_HOST}")
-        print()
-    else:
-        print("SSH tunnel connected\n")
+    pipeline.start()
+    player.start()
+    warm_up_gemini()
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+        print(f"Metrics at http://127.0.0.1:{METRICS_PORT}/metrics")
+    threading.Thread(target=prewarm_tts_cache, daemon=True).start()
+    threading.Thread(target=wait_for_gateway, daemon=True).start()
 
     # Start keyboard listener
     print("Listening for Right Command...\n")